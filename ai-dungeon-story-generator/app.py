@@ -9,9 +9,10 @@ from src.model_loader import load_local_pipeline, HostedInference
 from src.prompts import build_prompt
 from src.story_generator import generate_variations
 from src.story_moderation import simple_moderation_check
+from src import metrics
 
 from src.utils import save_story_file, read_config
-from src.ui import inject_css, story_card
+from src.ui import inject_css, story_card, metrics_panel
 
 # Load environment variables
 load_dotenv()
@@ -23,15 +24,29 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 inject_css()
+metrics.reset_trace()
 
 # Load configuration
 CONFIG_PATH = os.path.join("config", "config.yaml")
-config, has_cfg = read_config(CONFIG_PATH)
+with metrics.span("config_read"):
+    config, has_cfg = read_config(CONFIG_PATH)
 DEFAULT_MODEL = config.get("default_model", "gpt2-medium")
 GENRES = config.get(
     "genres",
     ["Fantasy", "Mystery", "Sci-Fi", "Horror", "Open-ended"]
 )
+METRICS_CFG = config.get("metrics") or {}
+MODERATION_CFG = config.get("moderation") or {}
+
+# Optional Prometheus-style text endpoint (started once per process)
+if METRICS_CFG.get("exporter_enabled", False):
+    try:
+        metrics.start_http_exporter(
+            int(METRICS_CFG.get("exporter_port", 9464)),
+            host=METRICS_CFG.get("exporter_host", "127.0.0.1")
+        )
+    except OSError as e:
+        st.sidebar.warning(f"Metrics exporter not started: {e}")
 
 # --- Main title & description
 st.title("AI Dungeon — Story Generator")
@@ -93,6 +108,10 @@ with st.sidebar:
     seed_val = None
     if seed_control:
         seed_val = st.number_input("Seed value", min_value=0, value=42, step=1)
+    show_debug = st.checkbox(
+        "Show performance debug panel",
+        value=bool(METRICS_CFG.get("debug_panel", False))
+    )
 
 # --- Input panel
 col1, col2 = st.columns([3, 1])
@@ -122,6 +141,7 @@ st.markdown("**Quick actions**")
 if st.button("Clear saved outputs"):
     if 'outputs' in st.session_state:
         del st.session_state['outputs']
+        st.session_state.pop('moderation_hits', None)
     st.success("Cleared outputs")
 
 # --- Load pipeline or hosted client
@@ -157,7 +177,8 @@ if generate:
     if not prompt or len(prompt.strip()) < 10:
         st.warning("Please write a prompt of at least ~10 characters.")
     else:
-        assembled = build_prompt(prompt, genre)
+        with metrics.span("prompt_build", chars=len(prompt)):
+            assembled = build_prompt(prompt, genre)
         st.info("Generating. This may take a moment for larger models.")
 
         model_type = st.session_state.get('model_type', 'local')
@@ -178,6 +199,14 @@ if generate:
             )
             st.session_state['outputs'] = outputs
 
+            # moderate once per generation; reruns reuse the stored hits
+            st.session_state['moderation_hits'] = {}
+            if MODERATION_CFG.get('enabled', True):
+                for out in outputs:
+                    hits = simple_moderation_check(out['continuation'], MODERATION_CFG.get('banned_words'))
+                    if hits:
+                        st.session_state['moderation_hits'][out['id']] = hits
+
         except Exception as e:
             st.error(f"Generation failed: {e}")
 
@@ -213,12 +242,12 @@ if 'prompt_appended' in st.session_state:
 # --- Simple moderation panel
 st.markdown("---")
 st.subheader("Moderation & logs")
-moderation_enabled = config.get('moderation', {}).get('enabled', True)
-if moderation_enabled and 'outputs' in st.session_state:
-    for out in st.session_state['outputs']:
-        hits = simple_moderation_check(out['continuation'], config.get('moderation', {}).get('banned_words'))
-        if hits:
-            st.error(f"Moderation hits in continuation #{out['id']}: {', '.join(hits)}")
+if 'outputs' in st.session_state:
+    for out_id, hits in st.session_state.get('moderation_hits', {}).items():
+        st.error(f"Moderation hits in continuation #{out_id}: {', '.join(hits)}")
+
+if show_debug:
+    metrics_panel(metrics.current_trace(), metrics.snapshot())
 
 st.markdown("---")
 st.caption(
@@ -0,0 +1,395 @@
+"""
+Generation benchmark harness
+- Measures what `generate_variations` costs per model, `max_new_tokens`,
+  `num_return_sequences` and CPU thread count
+- Runs fully offline on CPU: uses the real model when it is already in the
+  local Hugging Face cache, otherwise a tiny randomly initialized GPT-2
+- Emits machine-readable JSON (load time, TTFT, tokens/sec, p50/p99 latency,
+  peak RSS) and can diff a run against a saved baseline
+- Portable: peak RSS comes from `resource` on POSIX and from `psutil` (if
+  installed) on Windows; otherwise it is reported as null
+
+Run from the project root:
+    python benchmarks/bench_generation.py --output bench.json
+    python benchmarks/bench_generation.py --baseline bench.json
+"""
+import os
+
+# Never reach out to the Hub; must be set before transformers is imported.
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+import argparse
+import json
+import math
+import platform
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from src import metrics
+from src.prompts import build_prompt
+from src.story_generator import generate_variations
+from src.utils import read_config
+
+SIDEBAR_MODELS = ["gpt2", "gpt2-medium", "gpt2-large", "EleutherAI/gpt-neo-1.3B"]
+TINY_MODEL = "tiny-random-gpt2"
+EOS_TOKEN = "<|endoftext|>"
+BENCH_PROMPT = (
+    "A rain-soaked village at dusk, witches' lanterns flicker in the marketplace "
+    "while a stranger in a grey cloak asks for the old mapmaker by name."
+)
+
+# metrics compared against a baseline; higher is better only for throughput
+RUN_METRICS = ("ttft_s", "tokens_per_sec", "latency_p50_s", "latency_p99_s")
+MODEL_METRICS = ("load_time_s", "peak_rss_mb")
+HIGHER_IS_BETTER = {"tokens_per_sec"}
+
+# nearest-rank p99 equals the max below 100 samples, so it is only reported above that
+P99_MIN_REPEATS = 100
+
+# any one of these per group must be in the local HF cache for a model to count as cached
+CACHE_FILE_GROUPS = (
+    ("config.json",),
+    ("tokenizer.json", "vocab.json"),
+    ("model.safetensors", "model.safetensors.index.json",
+     "pytorch_model.bin", "pytorch_model.bin.index.json"),
+)
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of the current process in MiB, or None if
+    the platform offers no way to read it."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is reported in bytes on macOS and KiB on Linux
+        if sys.platform == "darwin":
+            return peak / (1024 * 1024)
+        return peak / 1024
+    try:
+        import psutil
+    except ImportError:
+        return None
+    # peak working set is the Windows equivalent of ru_maxrss
+    peak = getattr(psutil.Process().memory_info(), "peak_wset", None)
+    return peak / (1024 * 1024) if peak is not None else None
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile; good enough for a handful of repeats."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _is_cached(model_name: str) -> bool:
+    """True if the model config, tokenizer and (possibly sharded) weights can
+    be loaded without network. Shards themselves are not checked; a partial
+    download still surfaces as a per-model load error."""
+    from huggingface_hub import try_to_load_from_cache
+
+    return all(
+        any(isinstance(try_to_load_from_cache(model_name, fname), str) for fname in group)
+        for group in CACHE_FILE_GROUPS
+    )
+
+
+def _tiny_tokenizer():
+    """Build a small byte-level BPE tokenizer in memory (no downloads)."""
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+    from transformers import PreTrainedTokenizerFast
+
+    tok = Tokenizer(models.BPE())
+    tok.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tok.decoder = decoders.ByteLevel()
+    trainer = trainers.BpeTrainer(
+        vocab_size=512,
+        special_tokens=[EOS_TOKEN],
+        initial_alphabet=pre_tokenizers.ByteLevel.alphabet(),
+    )
+    corpus = [build_prompt(BENCH_PROMPT, genre) for genre in ("Fantasy", "Mystery", "Sci-Fi", "Horror")]
+    tok.train_from_iterator(corpus, trainer=trainer)
+    return PreTrainedTokenizerFast(tokenizer_object=tok, eos_token=EOS_TOKEN, pad_token=EOS_TOKEN)
+
+
+def _load_pipeline(model_name: str):
+    """Build a CPU text-generation pipeline the same way `load_local_pipeline` does.
+
+    `load_local_pipeline` is wrapped in `st.cache_resource`, which would hide
+    the load cost on repeat calls, so the benchmark loads models directly.
+    """
+    from transformers import AutoModelForCausalLM, AutoTokenizer, GPT2Config, GPT2LMHeadModel, pipeline
+
+    if model_name == TINY_MODEL:
+        tokenizer = _tiny_tokenizer()
+        cfg = GPT2Config(
+            vocab_size=len(tokenizer),
+            n_positions=2048,
+            n_embd=64,
+            n_layer=2,
+            n_head=2,
+            bos_token_id=tokenizer.eos_token_id,
+            eos_token_id=tokenizer.eos_token_id,
+        )
+        model = GPT2LMHeadModel(cfg)
+    else:
+        tokenizer = AutoTokenizer.from_pretrained(model_name, local_files_only=True)
+        if getattr(tokenizer, "pad_token", None) is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        model = AutoModelForCausalLM.from_pretrained(model_name, local_files_only=True)
+
+    model.eval()
+    return pipeline("text-generation", model=model, tokenizer=tokenizer, device=-1)
+
+
+class _FirstTokenTimer:
+    """Streamer that records when the first new token comes out of `generate`."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._prompt_seen = False
+        self.first_token_at: Optional[float] = None
+
+    def put(self, value):
+        # first put() is the prompt, every later one is a decode step
+        if not self._prompt_seen:
+            self._prompt_seen = True
+        elif self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    def end(self):
+        pass
+
+
+def _run_model(model_name: str, grid: Dict) -> Dict:
+    """Benchmark one model across the config grid. Runs in its own process
+    so load time and peak RSS are not polluted by other models.
+
+    Peak RSS is only reported per model: `ru_maxrss` is a process-lifetime
+    high-water mark, so a per-config value would just inherit earlier peaks.
+    """
+    import torch
+
+    rss_before = _peak_rss_mb()
+    t0 = time.perf_counter()
+    pipe = _load_pipeline(model_name)
+    load_s = time.perf_counter() - t0
+    timer = _FirstTokenTimer()
+    prompt = build_prompt(BENCH_PROMPT, grid["genre"])
+
+    runs = []
+    for threads in grid["threads"]:
+        torch.set_num_threads(threads)
+        for max_new_tokens in grid["max_new_tokens"]:
+            for n_return in grid["num_return_sequences"]:
+                kwargs = dict(
+                    streamer=timer,
+                    model_type="local",
+                    model_name=model_name,
+                    prompt=prompt,
+                    n_return=n_return,
+                    max_new_tokens=max_new_tokens,
+                )
+                for i in range(grid["warmup"]):
+                    generate_variations(pipe, seed=i, **kwargs)
+
+                latencies, ttfts, tps, tokens = [], [], [], []
+                for i in range(grid["repeats"]):
+                    timer.reset()
+                    tokens_before = metrics.counter_value("tokens_generated_total")
+                    start = time.perf_counter()
+                    generate_variations(pipe, seed=grid["warmup"] + i, **kwargs)
+                    elapsed = time.perf_counter() - start
+                    # excludes pad/EOS filler after a sequence finishes
+                    new_tokens = metrics.counter_value("tokens_generated_total") - tokens_before
+                    latencies.append(elapsed)
+                    if timer.first_token_at is not None:
+                        ttfts.append(timer.first_token_at - start)
+                    tokens.append(new_tokens)
+                    tps.append(new_tokens / elapsed if elapsed > 0 else 0.0)
+
+                runs.append({
+                    "key": f"{model_name}|threads={threads}|max_new_tokens={max_new_tokens}|n_return={n_return}",
+                    "threads": threads,
+                    "max_new_tokens": max_new_tokens,
+                    "num_return_sequences": n_return,
+                    "repeats": grid["repeats"],
+                    "ttft_s": statistics.median(ttfts) if ttfts else None,
+                    "tokens_generated": statistics.median(tokens),
+                    "tokens_per_sec": statistics.median(tps),
+                    "latency_p50_s": _percentile(latencies, 50),
+                    "latency_p99_s": _percentile(latencies, 99) if len(latencies) >= P99_MIN_REPEATS else None,
+                    "latency_max_s": max(latencies),
+                })
+
+    return {
+        "model": model_name,
+        "load_time_s": load_s,
+        "rss_before_load_mb": rss_before,
+        "peak_rss_mb": _peak_rss_mb(),
+        "runs": runs,
+    }
+
+
+def _resolve_models(requested: List[str]) -> List[Dict]:
+    """Map requested models to what can actually run offline.
+
+    Uncached models all fall back to a single tiny random GPT-2 entry.
+    """
+    resolved, fallback_for = [], []
+    for name in requested:
+        if name == TINY_MODEL:
+            continue
+        if _is_cached(name):
+            resolved.append({"model": name, "source": "cache"})
+        else:
+            fallback_for.append(name)
+    if fallback_for or TINY_MODEL in requested:
+        resolved.append({"model": TINY_MODEL, "source": "random-init", "fallback_for": fallback_for})
+    return resolved
+
+
+def _regression(metric: str, old_v: float, new_v: Optional[float]) -> Optional[float]:
+    """Relative regression of `new_v` vs `old_v` (positive = worse).
+
+    A missing current value is an infinite regression.
+    """
+    if new_v is None:
+        return math.inf
+    worse_by = old_v - new_v if metric in HIGHER_IS_BETTER else new_v - old_v
+    if old_v == 0:
+        return math.inf if worse_by > 0 else 0.0
+    return worse_by / old_v
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[Dict]:
+    """Return metrics that regressed by more than `tolerance` (fraction).
+
+    Baseline models, runs and metrics missing from the current report count
+    as regressions; only metrics the baseline itself lacks are skipped.
+    """
+    cur_models = {m["model"]: m for m in current.get("models", [])}
+    cur_runs = {r["key"]: r for m in current.get("models", []) for r in m["runs"]}
+    pairs = []
+    for base_model in baseline.get("models", []):
+        name = base_model["model"]
+        pairs.append((name, MODEL_METRICS, base_model, cur_models.get(name)))
+        for base_run in base_model["runs"]:
+            pairs.append((base_run["key"], RUN_METRICS, base_run, cur_runs.get(base_run["key"])))
+
+    regressions = []
+    for key, metric_names, old, new in pairs:
+        for metric in metric_names:
+            old_v = old.get(metric)
+            if old_v is None:
+                continue
+            new_v = new.get(metric) if new is not None else None
+            change = _regression(metric, old_v, new_v)
+            if change > tolerance:
+                regressions.append({
+                    "key": key,
+                    "metric": metric,
+                    "baseline": old_v,
+                    "current": new_v,
+                    "regression_pct": round(change * 100, 2) if math.isfinite(change) else None,
+                })
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    config, _ = read_config(os.path.join(PROJECT_ROOT, "config", "config.yaml"))
+    default_models = list(dict.fromkeys([config.get("default_model", "gpt2-medium")] + SIDEBAR_MODELS))
+    cpu_count = os.cpu_count() or 1
+
+    parser = argparse.ArgumentParser(description="Benchmark generate_variations on CPU.")
+    parser.add_argument("--models", nargs="+", default=default_models,
+                        help=f"models to benchmark; uncached ones fall back to {TINY_MODEL}")
+    parser.add_argument("--max-new-tokens", nargs="+", type=int, default=[50, int(config.get("max_new_tokens", 300))])
+    parser.add_argument("--num-return", nargs="+", type=int, default=[1, int(config.get("num_return_sequences", 3))])
+    parser.add_argument("--threads", nargs="+", type=int, default=sorted({1, cpu_count}))
+    parser.add_argument("--genre", default="Fantasy")
+    parser.add_argument("--repeats", type=int, default=10,
+                        help=f"timed runs per config; latency_p99_s needs at least {P99_MIN_REPEATS}")
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--output", help="write JSON results to this file instead of stdout")
+    parser.add_argument("--baseline", help="JSON from a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="allowed relative regression before --baseline fails (default 0.10)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    import torch
+    import transformers
+
+    grid = {
+        "max_new_tokens": args.max_new_tokens,
+        "num_return_sequences": args.num_return,
+        "threads": args.threads,
+        "genre": args.genre,
+        "repeats": args.repeats,
+        "warmup": args.warmup,
+    }
+
+    models = []
+    for entry in _resolve_models(args.models):
+        print(f"benchmarking {entry['model']} ({entry['source']})...", file=sys.stderr)
+        # fresh process per model so load time and peak RSS are isolated
+        try:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                result = pool.submit(_run_model, entry["model"], grid).result()
+        except Exception as e:
+            # keep going so one broken cache entry does not lose every other model's numbers
+            print(f"  failed: {e!r}", file=sys.stderr)
+            result = {"model": entry["model"], "error": repr(e), "runs": []}
+        result.update({k: v for k, v in entry.items() if k != "model"})
+        models.append(result)
+
+    report = {
+        "schema_version": 1,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "torch": torch.__version__,
+            "transformers": transformers.__version__,
+        },
+        "grid": grid,
+        "models": models,
+    }
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        report["regressions"] = compare(report, baseline, args.tolerance)
+        if report["regressions"]:
+            exit_code = 1
+
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload + "\n")
+    else:
+        print(payload)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""
+Lightweight in-process instrumentation.
+- `span(stage)` times a pipeline stage (config read, model load, prompt build,
+  tokenization, generation, decoding, cleanup, moderation)
+- `inc(name)` bumps counters such as tokens generated, cache hits and model loads
+- `render_text()` exports everything in Prometheus text format; optionally
+  served over HTTP by `start_http_exporter`
+- Spans from the current Streamlit run are kept per thread for the debug panel
+
+No third-party dependencies, so it works offline and in the benchmark harness.
+"""
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Union
+import threading
+import time
+
+# seconds; covers a fast tokenization up to a slow large-model generation
+LATENCY_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+COUNTER_HELP = {
+    "model_loads_total": "Models loaded from disk or the Hub.",
+    "model_cache_hits_total": "Model load requests served from the resource cache.",
+    "generations_total": "Calls to generate_variations.",
+    "tokens_generated_total": "New tokens produced by local models across all continuations.",
+    "prompt_tokens_total": "Prompt tokens fed to local models.",
+    "moderation_hits_total": "Banned words found by the moderation check.",
+}
+
+_lock = threading.Lock()
+_counters: Dict[str, Union[int, float]] = {}
+_histograms: Dict[str, Dict] = {}
+_local = threading.local()
+_exporter: Optional[ThreadingHTTPServer] = None
+
+
+def inc(name: str, value: Union[int, float] = 1) -> None:
+    """Increment a counter by `value`. Integer counters stay `int` so they
+    are exported exactly however large they grow."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def counter_value(name: str) -> Union[int, float]:
+    """Current value of a counter (0 if never incremented)."""
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def observe(stage: str, seconds: float) -> None:
+    """Record a stage duration in its latency histogram."""
+    with _lock:
+        hist = _histograms.get(stage)
+        if hist is None:
+            hist = {"buckets": [0] * len(LATENCY_BUCKETS), "count": 0, "sum": 0.0}
+            _histograms[stage] = hist
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                hist["buckets"][i] += 1
+        hist["count"] += 1
+        hist["sum"] += seconds
+
+
+@contextmanager
+def span(stage: str, **attrs):
+    """Time the enclosed block as `stage`.
+
+    Extra keyword attributes (e.g. model name, token counts) are attached to
+    the trace entry shown in the debug panel. The block may add more by
+    mutating the yielded dict.
+    """
+    entry = {"stage": stage, "attrs": dict(attrs)}
+    start = time.perf_counter()
+    try:
+        yield entry["attrs"]
+    finally:
+        entry["seconds"] = time.perf_counter() - start
+        observe(stage, entry["seconds"])
+        _trace().append(entry)
+
+
+def _trace() -> List[Dict]:
+    if not hasattr(_local, "trace"):
+        _local.trace = []
+    return _local.trace
+
+
+def reset_trace() -> None:
+    """Start a fresh trace for the current thread (call once per app run)."""
+    _local.trace = []
+
+
+def current_trace() -> List[Dict]:
+    """Spans recorded on this thread since the last `reset_trace`."""
+    return list(_trace())
+
+
+def snapshot() -> Dict:
+    """Copy of all counters and per-stage count/total/mean latency."""
+    with _lock:
+        stages = {
+            stage: {
+                "count": h["count"],
+                "total_s": h["sum"],
+                "mean_s": h["sum"] / h["count"] if h["count"] else 0.0,
+            }
+            for stage, h in _histograms.items()
+        }
+        return {"counters": dict(_counters), "stages": stages}
+
+
+def reset() -> None:
+    """Clear all counters and histograms."""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def _format_value(value: Union[int, float]) -> str:
+    """Exact exposition value: integers without exponent, floats via repr."""
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def render_text(prefix: str = "story_app") -> str:
+    """Render all metrics in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        for name in sorted(_counters):
+            metric = f"{prefix}_{name}"
+            lines.append(f"# HELP {metric} {COUNTER_HELP.get(name, name)}")
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {_format_value(_counters[name])}")
+
+        if _histograms:
+            metric = f"{prefix}_stage_duration_seconds"
+            lines.append(f"# HELP {metric} Wall-clock time spent in each app stage.")
+            lines.append(f"# TYPE {metric} histogram")
+            for stage in sorted(_histograms):
+                h = _histograms[stage]
+                for bound, count in zip(LATENCY_BUCKETS, h["buckets"]):
+                    lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound:g}"}} {count}')
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="+Inf"}} {h["count"]}')
+                lines.append(f'{metric}_sum{{stage="{stage}"}} {h["sum"]:.6f}')
+                lines.append(f'{metric}_count{{stage="{stage}"}} {h["count"]}')
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # keep scrapes out of the Streamlit console
+        pass
+
+
+def start_http_exporter(port: int = 9464, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve `/metrics` on a daemon thread. Safe to call on every rerun;
+    only the first call starts a server. Binds to localhost unless a
+    `host` such as "0.0.0.0" is passed explicitly."""
+    global _exporter
+    with _lock:
+        if _exporter is None:
+            _exporter = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_exporter.serve_forever, daemon=True).start()
+        return _exporter
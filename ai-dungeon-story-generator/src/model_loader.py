@@ -5,16 +5,34 @@ Model loader module
 """
 from typing import Optional
 import os
+import threading
 import streamlit as st
 from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
 import torch
 from huggingface_hub import InferenceClient
+from src import metrics
+
+# set by `_cached_local_pipeline` on the calling thread when the cache misses
+_load_state = threading.local()
 
-@st.cache_resource
 def load_local_pipeline(model_name: str, cache_dir: Optional[str] = None):
     """Load a local transformers text-generation pipeline with caching.
     Returns a pipeline ready for generation.
+    Records a `model_load` span and counts cache hits vs. real loads.
     """
+    _load_state.loaded = False
+    with metrics.span("model_load", model=model_name) as attrs:
+        pipe = _cached_local_pipeline(model_name, cache_dir)
+        attrs["cache_hit"] = not _load_state.loaded
+    if attrs["cache_hit"]:
+        metrics.inc("model_cache_hits_total")
+    return pipe
+
+@st.cache_resource
+def _cached_local_pipeline(model_name: str, cache_dir: Optional[str] = None):
+    """Build the pipeline; only runs on a `st.cache_resource` miss."""
+    _load_state.loaded = True
+    metrics.inc("model_loads_total")
     device = 0 if torch.cuda.is_available() else -1
     tokenizer = AutoTokenizer.from_pretrained(model_name, cache_dir=cache_dir)
     
@@ -3,10 +3,12 @@ Core generation helpers
 - Provides a single function `generate_variations` that works for both local
 pipeline and hosted inference
 - Supports chunked generation (for very long stories) and seed control
+- Records tokenize / generate / decode / cleanup spans and token counters in `src.metrics`
 """
 from typing import List, Dict, Optional, Any
 from transformers import set_seed
 import re
+from src import metrics
 
 def _clean_generated_text(prompt: str, generated: str) -> str:
     """Remove prompt echo and trim to first coherent paragraph break."""
@@ -19,6 +21,13 @@ def _clean_generated_text(prompt: str, generated: str) -> str:
     text = re.sub(r"\n\s+", "\n", text)
     return text
 
+def _count_new_tokens(new_ids: List[int], eos_token_id: Optional[int]) -> int:
+    """Count generated tokens up to and including the first EOS.
+    Sequences that finish early are right-padded with EOS (used as pad)."""
+    if eos_token_id is not None and eos_token_id in new_ids:
+        return new_ids.index(eos_token_id) + 1
+    return len(new_ids)
+
 def generate_variations(
     pipe_or_hosted: Any,
     model_type: str,
@@ -30,10 +39,12 @@ def generate_variations(
     top_p: float = 0.9,
     repetition_penalty: float = 1.1,
     seed: Optional[int] = None,
+    streamer: Optional[Any] = None,
 ) -> List[Dict]:
     """
     Generate `n_return` variations using either a transformers pipeline (local) 
     or HostedInference wrapper.
+    `streamer` is an optional transformers streamer, used for local models only.
 
     Returns list of dicts: {id, continuation, full_text}
     """
@@ -53,21 +64,40 @@ def generate_variations(
     }
 
     if model_type == "local":
-        # pipe_or_hosted is a transformers pipeline
-        outputs = pipe_or_hosted(prompt, **{k: v for k, v in params.items() if v is not None})
-        for i, out in enumerate(outputs):
-            full = out.get("generated_text", out.get("text", ""))
-            cont = _clean_generated_text(prompt, full)
-            results.append({"id": i + 1, "continuation": cont, "full_text": full})
+        # pipe_or_hosted is a transformers pipeline; call its model directly so the
+        # prompt is tokenized once and token counts come from the generated ids
+        tokenizer = pipe_or_hosted.tokenizer
+        with metrics.span("tokenize") as attrs:
+            inputs = tokenizer(prompt, return_tensors="pt").to(pipe_or_hosted.device)
+            prompt_tokens = int(inputs["input_ids"].shape[-1])
+            attrs["prompt_tokens"] = prompt_tokens
+        metrics.inc("prompt_tokens_total", prompt_tokens)
+
+        gen_kwargs = {k: v for k, v in params.items() if v is not None}
+        if streamer is not None:
+            gen_kwargs["streamer"] = streamer
+        with metrics.span("generate", model=model_name, n_return=n_return, max_new_tokens=max_new_tokens):
+            sequences = pipe_or_hosted.model.generate(**inputs, **gen_kwargs)
+
+        with metrics.span("decode") as attrs:
+            new_ids = sequences[:, prompt_tokens:].tolist()
+            new_tokens = sum(_count_new_tokens(row, tokenizer.eos_token_id) for row in new_ids)
+            attrs["tokens_generated"] = new_tokens
+            texts = [prompt + tokenizer.decode(row, skip_special_tokens=True) for row in new_ids]
+        metrics.inc("tokens_generated_total", new_tokens)
 
     elif model_type == "hosted":
         # pipe_or_hosted is HostedInference
-        raw = pipe_or_hosted.generate(model_name, prompt, params)
-        for i, text in enumerate(raw):
-            cont = _clean_generated_text(prompt, text)
-            results.append({"id": i + 1, "continuation": cont, "full_text": text})
+        with metrics.span("generate", model=model_name, n_return=n_return, max_new_tokens=max_new_tokens, hosted=True):
+            texts = pipe_or_hosted.generate(model_name, prompt, params)
 
     else:
         raise ValueError("model_type must be 'local' or 'hosted'")
 
+    with metrics.span("cleanup"):
+        for i, full in enumerate(texts):
+            cont = _clean_generated_text(prompt, full)
+            results.append({"id": i + 1, "continuation": cont, "full_text": full})
+
+    metrics.inc("generations_total")
     return results
@@ -6,6 +6,7 @@ For production, integrate a dedicated moderation API or service.
 """
 from typing import List
 import re
+from src import metrics
 
 DEFAULT_BANNED = ["rape", "sex", "kill", "murder", "child", "porn", "incest"]
 
@@ -22,11 +23,13 @@ def simple_moderation_check(text: str, banned_words: List[str] = None) -> List[s
     """
     banned = banned_words or DEFAULT_BANNED
     matches = []
-    lowered = text.lower()
 
-    for word in banned:
-        # word boundary check
-        if re.search(rf"\b{re.escape(word)}\b", lowered):
-            matches.append(word)
+    with metrics.span("moderation", words=len(banned)):
+        lowered = text.lower()
+        for word in banned:
+            # word boundary check
+            if re.search(rf"\b{re.escape(word)}\b", lowered):
+                matches.append(word)
 
+    metrics.inc("moderation_hits_total", len(matches))
     return matches
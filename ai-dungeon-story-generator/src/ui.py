@@ -2,7 +2,7 @@
 Streamlit UI helpers with CSS injection for a polished look.
 Minimal, safe CSS included. For advanced UI, consider a React frontend.
 """
-from typing import Optional
+from typing import Dict, List, Optional
 import streamlit as st
 
 
@@ -67,3 +67,46 @@ def story_card(title: str, body: str, uid: Optional[str] = None, muted_text: Opt
     html += "</div>"
 
     st.markdown(html, unsafe_allow_html=True)
+
+
+def metrics_panel(trace: List[Dict], snapshot: Dict):
+    """
+    Render a sidebar debug panel with per-stage timings.
+
+    Args:
+        trace (List[Dict]): Spans recorded during the current run (`metrics.current_trace()`).
+        snapshot (Dict): Process-wide counters and stage totals (`metrics.snapshot()`).
+    """
+    with st.sidebar.expander("Performance debug", expanded=True):
+        st.markdown("**This run**")
+        if trace:
+            rows = [
+                {
+                    "stage": span["stage"],
+                    "ms": round(span["seconds"] * 1000, 1),
+                    "details": ", ".join(f"{k}={v}" for k, v in span["attrs"].items()),
+                }
+                for span in trace
+            ]
+            st.table(rows)
+            slowest = max(trace, key=lambda span: span["seconds"])
+            st.caption(f"Slowest stage: {slowest['stage']} ({slowest['seconds'] * 1000:.0f} ms)")
+        else:
+            st.caption("No stages recorded yet.")
+
+        st.markdown("**Since startup**")
+        counters = snapshot.get("counters", {})
+        if counters:
+            st.table([{"counter": name, "value": value} for name, value in sorted(counters.items())])
+
+        stages = snapshot.get("stages", {})
+        if stages:
+            st.table([
+                {
+                    "stage": stage,
+                    "count": s["count"],
+                    "mean ms": round(s["mean_s"] * 1000, 1),
+                    "total s": round(s["total_s"], 2),
+                }
+                for stage, s in sorted(stages.items())
+            ])